@@ -1,8 +1,11 @@
 import configparser
+import hashlib
+import json
 import os
 import shutil
 import subprocess
 import sys
+import tempfile
 import time
 from collections import OrderedDict
 
@@ -32,6 +35,7 @@ _config_defaults = OrderedDict([
     ('build', OrderedDict([
         ('asset_dir', 'assets/'),
         ('export_dir', 'game/assets/'),
+        ('jobs', 0),
     ])),
     ('run', OrderedDict([
         ('main_file', 'game/main.py'),
@@ -180,6 +184,174 @@ def get_rel_path(config, path):
     return os.path.relpath(path, config['internal']['projectdir'])
 
 
+# Bump when exported files would differ for the same source, forcing a rebuild
+EXPORTER_VERSION = 1
+MANIFEST_NAME = '.pman_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def get_output_name(asset):
+    if asset.endswith('.blend'):
+        return asset[:-len('.blend')] + '.bam'
+    return asset
+
+
+def get_exporter(asset):
+    if asset.endswith('.blend'):
+        return 'bam-{}'.format(EXPORTER_VERSION)
+    return 'copy'
+
+
+def hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(dstdir, name=MANIFEST_NAME):
+    try:
+        with open(os.path.join(dstdir, name)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print("Could not read build manifest, rebuilding all assets: {}".format(e))
+        return {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('outputs', {})
+
+
+def save_manifest(dstdir, outputs, name=MANIFEST_NAME):
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'outputs': outputs,
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=dstdir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, os.path.join(dstdir, name))
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+def make_manifest_entry(srcdir, asset):
+    src = os.path.join(srcdir, asset)
+    stat = os.stat(src)
+    return {
+        'source': asset,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': hash_file(src),
+        'exporter': get_exporter(asset),
+    }
+
+
+def is_stale(srcdir, dstdir, asset, outputs):
+    output = get_output_name(asset)
+    entry = outputs.get(output)
+    if entry is None or entry['source'] != asset or entry['exporter'] != get_exporter(asset):
+        return True
+    if not os.path.exists(os.path.join(dstdir, output)):
+        return True
+
+    src = os.path.join(srcdir, asset)
+    stat = os.stat(src)
+    if stat.st_mtime_ns == entry['mtime'] and stat.st_size == entry['size']:
+        return False
+
+    # The timestamp changed (e.g., a fresh checkout), compare contents
+    if stat.st_size != entry['size'] or hash_file(src) != entry['hash']:
+        return True
+    entry['mtime'] = stat.st_mtime_ns
+    return False
+
+
+def get_assets(srcdir):
+    return sorted(
+        asset for asset in os.listdir(srcdir)
+        if os.path.isfile(os.path.join(srcdir, asset))
+    )
+
+
+def get_stale_assets(srcdir, dstdir, outputs):
+    # Also removes outputs whose source is gone, only files listed in the
+    # manifest are touched
+    assets = get_assets(srcdir)
+    live_outputs = {get_output_name(asset) for asset in assets}
+    for output in list(outputs):
+        if output not in live_outputs:
+            del outputs[output]
+            dst = os.path.join(dstdir, output)
+            try:
+                os.remove(dst)
+                print('Removed "{}", its source is gone'.format(dst))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print('Could not remove orphaned output "{}": {}'.format(dst, e))
+
+    return [asset for asset in assets if is_stale(srcdir, dstdir, asset, outputs)]
+
+
+def split_jobs(srcdir, assets, jobs):
+    # Hand the largest files out first, each to the least loaded worker
+    sizes = {asset: os.stat(os.path.join(srcdir, asset)).st_size for asset in assets}
+    chunks = [[] for i in range(min(jobs, len(assets)))]
+    loads = [0] * len(chunks)
+    for asset in sorted(assets, key=sizes.get, reverse=True):
+        idx = loads.index(min(loads))
+        chunks[idx].append(asset)
+        loads[idx] += sizes[asset]
+    return chunks
+
+
+def export_blend_files(srcdir, dstdir, assets, jobs, outputs):
+    script = os.path.join(os.path.dirname(__file__), 'pman_build.py')
+    chunks = split_jobs(srcdir, assets, jobs)
+
+    if len(chunks) == 1:
+        args = ['blender', '-b', '-P', script, '--', srcdir, dstdir] + chunks[0]
+        retcode = subprocess.call(args, env=os.environ.copy())
+        outputs.update(load_manifest(dstdir))
+        return [retcode]
+
+    # Each worker records what it exported in its own manifest fragment,
+    # merged here once everyone is done
+    print("Exporting {} .blend files with {} Blender processes".format(len(assets), len(chunks)))
+    workers = []
+    for idx, chunk in enumerate(chunks):
+        fragment = '{}.{}'.format(MANIFEST_NAME, idx)
+        args = [
+            'blender', '-b', '-P', script, '--',
+            '--fragment', fragment, srcdir, dstdir,
+        ] + chunk
+        log = tempfile.TemporaryFile(mode='w+')
+        proc = subprocess.Popen(args, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT)
+        workers.append((proc, log, fragment))
+
+    retcodes = []
+    for idx, (proc, log, fragment) in enumerate(workers):
+        retcodes.append(proc.wait())
+        log.seek(0)
+        for line in log:
+            print("[Blender {}] {}".format(idx, line), end='')
+        log.close()
+
+        outputs.update(load_manifest(dstdir, fragment))
+        try:
+            os.remove(os.path.join(dstdir, fragment))
+        except FileNotFoundError:
+            pass
+
+    return retcodes
+
+
 def build(config=None):
     if config is None:
         config = get_config()
@@ -200,17 +372,35 @@ def build(config=None):
     print("Read assets from: {}".format(srcdir))
     print("Export them to: {}".format(dstdir))
 
-    args = [
-        'blender',
-        '-b',
-        '-P',
-        os.path.join(os.path.dirname(__file__), 'pman_build.py'),
-        '--',
-        srcdir,
-        dstdir,
-    ]
-
-    subprocess.call(args, env=os.environ.copy())
+    # Check the manifest here so Blender only starts up when a .blend
+    # file actually needs exporting
+    outputs = load_manifest(dstdir)
+    # Entries are flat, copying each one is enough to spot in-place updates
+    loaded_outputs = {output: dict(entry) for output, entry in outputs.items()}
+    stale_assets = get_stale_assets(srcdir, dstdir, outputs)
+    blend_assets = []
+    for asset in stale_assets:
+        if asset.endswith('.blend'):
+            blend_assets.append(asset)
+            continue
+        src = os.path.join(srcdir, asset)
+        dst = os.path.join(dstdir, get_output_name(asset))
+        print('Copying non .blend file from "{}" to "{}"'.format(src, dst))
+        entry = make_manifest_entry(srcdir, asset)
+        shutil.copyfile(src, dst)
+        outputs[get_output_name(asset)] = entry
+    if outputs != loaded_outputs:
+        save_manifest(dstdir, outputs)
+
+    if blend_assets:
+        jobs = config.getint('build', 'jobs') or os.cpu_count() or 1
+        retcodes = export_blend_files(srcdir, dstdir, blend_assets, jobs, outputs)
+        save_manifest(dstdir, outputs)
+        for idx, retcode in enumerate(retcodes):
+            if retcode != 0:
+                print("Blender process {} exited with code {}".format(idx, retcode))
+    elif not stale_assets:
+        print("Nothing to do, all assets are up to date")
 
     print("Build took {:.4f}s".format(time.perf_counter() - stime))
 
@@ -4,26 +4,48 @@ import shutil
 
 import bpy
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pman
+
 print(sys.argv)
-srcdir, dstdir = sys.argv[-2:]
+args = sys.argv[sys.argv.index('--')+1:]
+
+# Parallel workers from pman.build write what they export to a manifest
+# fragment instead of the shared manifest
+fragment = None
+if args[0] == '--fragment':
+    fragment = args[1]
+    args = args[2:]
+
+srcdir, dstdir = args[:2]
 
 print('Exporting:', srcdir)
 print('Export to:', dstdir)
 
-for asset in os.listdir(srcdir):
-    src = os.path.join(srcdir, asset)
-    dst = os.path.join(dstdir, asset)
+outputs = {} if fragment else pman.load_manifest(dstdir)
+
+# pman.build passes the assets it found stale, otherwise check everything
+assets = args[2:]
+if not assets:
+    assets = pman.get_stale_assets(srcdir, dstdir, outputs)
+
+try:
+    for asset in assets:
+        src = os.path.join(srcdir, asset)
+        dst = os.path.join(dstdir, pman.get_output_name(asset))
 
-    if os.path.exists(dst) and os.stat(src).st_mtime <= os.stat(dst).st_mtime:
-        print('Skip building up-to-date file: {}'.format(dst))
-        continue
+        entry = pman.make_manifest_entry(srcdir, asset)
+        if asset.endswith('.blend'):
+            print('Converting .blend file ({}) to .bam ({})'.format(src, dst))
+            bpy.ops.wm.open_mainfile(filepath=src)
+            bpy.ops.panda_engine.export_bam(filepath=dst)
+        else:
+            print('Copying non .blend file from "{}" to "{}'.format(src, dst))
+            shutil.copyfile(src, dst)
 
-    if asset.endswith('.blend'):
-        print('Converting .blend file ({}) to .bam ({})'.format(src, dst))
-        topath = os.path.join(dstdir, asset.replace('.blend', '.bam'))
-        dst = dst.replace('.blend', '.bam')
-        bpy.ops.wm.open_mainfile(filepath=src)
-        bpy.ops.panda_engine.export_bam(filepath=dst)
+        outputs[pman.get_output_name(asset)] = entry
+finally:
+    if fragment:
+        pman.save_manifest(dstdir, outputs, fragment)
     else:
-        print('Copying non .blend file from "{}" to "{}'.format(src, dst))
-        shutil.copyfile(src, dst)
+        pman.save_manifest(dstdir, outputs)
@@ -35,6 +35,14 @@ TEMPLATES = {
     },
 }
 class Character:
+    __slots__ = (
+        'name',
+        'health',
+        'attack',
+        'roles',
+        'position',
+    )
+
     _serialize_fields = [
         'name',
         'health',
@@ -64,25 +72,34 @@ class Character:
 
 
     @classmethod
-    def from_random(cls):
+    def from_random(cls, rng=None):
+        if rng is None:
+            rng = random
+
         result = cls()
         result.name = 'Random'
 
-        stat_dist = [random.random() for i in range(2)]
-        stat_sum = sum(stat_dist)
-        stat_dist = [i / stat_sum for i in stat_dist]
-        points = 24
-        result.health = max(1, int(points * stat_dist[0]))
-        result.attack = max(1, int(points * stat_dist[1]))
+        health_share = rng.random()
+        attack_share = rng.random()
+        points = 24 / (health_share + attack_share)
+        result.health = max(1, int(points * health_share))
+        result.attack = max(1, int(points * attack_share))
 
-        num_roles = 2
-        result.roles = random.sample(ROLES, num_roles)
+        # Two distinct roles, drawn with random() as it is much cheaper than
+        # sample() in batch simulations
+        first = int(rng.random() * len(ROLES))
+        second = int(rng.random() * (len(ROLES) - 1))
+        if second >= first:
+            second += 1
+        result.roles = [ROLES[first], ROLES[second]]
 
         return result
 
     @classmethod
-    def from_template(cls, template_name):
-        template = TEMPLATES[template_name]
+    def from_template(cls, template_name, templates=None):
+        if templates is None:
+            templates = TEMPLATES
+        template = templates[template_name]
 
         result = cls()
         for key, value in template.items():
@@ -1 +1,3 @@
 from .system import System
+from .encounters import RandomEncounter, UniformEncounter
+from .events import CombatLog, CombatEvent, EVENT_DAMAGE, EVENT_HEAL
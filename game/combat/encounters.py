@@ -0,0 +1,99 @@
+import bisect
+
+
+class RandomEncounter:
+    """Draft enemies one at a time from the templates that are still affordable
+
+    Picks are uniform over the affordable templates at every step, which is
+    the same distribution the old rejection loop produced, but every draw is
+    used and drafting stops once nothing fits the remaining points.
+    """
+
+    def __init__(self, template_costs):
+        self.options = sorted(template_costs, key=template_costs.get)
+        self.costs = [template_costs[option] for option in self.options]
+
+    def generate(self, budget, rng):
+        options = self.options
+        costs = self.costs
+
+        enemies = []
+        remaining_points = budget
+        num_affordable = bisect.bisect_right(costs, remaining_points)
+        while num_affordable:
+            idx = int(rng.random() * num_affordable)
+            enemies.append(options[idx])
+            remaining_points -= costs[idx]
+            num_affordable = bisect.bisect_right(costs, remaining_points, 0, num_affordable)
+
+        return enemies
+
+    def compositions(self, budget):
+        """Yield every {template: count} that spends exactly budget points"""
+        def _compositions(start, remaining_points):
+            if remaining_points == 0:
+                yield {}
+                return
+            for idx in range(start, len(self.options)):
+                cost = self.costs[idx]
+                if cost > remaining_points:
+                    break
+                for rest in _compositions(idx, remaining_points - cost):
+                    rest[self.options[idx]] = rest.get(self.options[idx], 0) + 1
+                    yield rest
+
+        yield from _compositions(0, budget)
+
+
+class UniformEncounter(RandomEncounter):
+    """Pick uniformly among all compositions that spend exactly the budget
+
+    Composition counts are tabulated once per budget (O(templates * budget))
+    and sampling walks the table, so large budgets stay cheap.
+    """
+
+    def __init__(self, template_costs):
+        super().__init__(template_costs)
+        self._ways = None
+
+    def _count_table(self, budget):
+        if self._ways is not None and len(self._ways[0]) > budget:
+            return self._ways
+
+        # ways[t][b]: number of compositions of b points using templates t and up
+        num_options = len(self.options)
+        ways = [[0] * (budget + 1) for _ in range(num_options + 1)]
+        ways[num_options][0] = 1
+        for t in reversed(range(num_options)):
+            cost = self.costs[t]
+            for b in range(budget + 1):
+                ways[t][b] = ways[t + 1][b]
+                if b >= cost:
+                    ways[t][b] += ways[t][b - cost]
+
+        self._ways = ways
+        return ways
+
+    def count(self, budget):
+        return self._count_table(budget)[0][budget]
+
+    def generate(self, budget, rng):
+        ways = self._count_table(budget)
+
+        # Spend as much of the budget as the template costs allow
+        while budget > 0 and not ways[0][budget]:
+            budget -= 1
+
+        enemies = []
+        t = 0
+        remaining_points = budget
+        while remaining_points > 0:
+            cost = self.costs[t]
+            if cost <= remaining_points and rng.randrange(ways[t][remaining_points]) < ways[t][remaining_points - cost]:
+                enemies.append(self.options[t])
+                remaining_points -= cost
+            else:
+                t += 1
+
+        rng.shuffle(enemies)
+        return enemies
@@ -0,0 +1,67 @@
+from array import array
+from collections import namedtuple
+
+
+EVENT_DAMAGE = 0
+EVENT_HEAL = 1
+
+_EVENT_SIZE = 4
+
+
+CombatEvent = namedtuple('CombatEvent', ['actor', 'target', 'amount', 'kind'])
+
+
+class CombatLog:
+    _event_templates = {
+        EVENT_DAMAGE: '{} deals {} points of damage to {}',
+        EVENT_HEAL: '{} heals {} points of damage to {}',
+    }
+
+    def __init__(self, combatants, capacity=16):
+        self.combatants = combatants
+        self.size = 0
+        self._buffer = array('i', [0]) * (_EVENT_SIZE * max(1, capacity))
+
+    def clear(self):
+        self.size = 0
+
+    def append(self, actor, target, amount, kind):
+        buf = self._buffer
+        offset = self.size * _EVENT_SIZE
+        if offset == len(buf):
+            buf.extend(buf)
+        buf[offset] = actor
+        buf[offset + 1] = target
+        buf[offset + 2] = amount
+        buf[offset + 3] = kind
+        self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.size
+        if not 0 <= idx < self.size:
+            raise IndexError('CombatLog index out of range')
+        offset = idx * _EVENT_SIZE
+        return CombatEvent(*self._buffer[offset:offset + _EVENT_SIZE])
+
+    def __iter__(self):
+        buf = self._buffer
+        for offset in range(0, self.size * _EVENT_SIZE, _EVENT_SIZE):
+            yield CombatEvent(buf[offset], buf[offset + 1], buf[offset + 2], buf[offset + 3])
+
+    def render_event(self, event):
+        return self._event_templates[event.kind].format(
+            self.combatants[event.actor].name,
+            event.amount,
+            self.combatants[event.target].name
+        )
+
+    def lines(self):
+        for event in self:
+            yield self.render_event(event)
+
+    def __str__(self):
+        return '\n'.join(self.lines())
@@ -0,0 +1,219 @@
+import argparse
+import collections
+import itertools
+import random
+import time
+
+from character import Character
+from .encounters import RandomEncounter, UniformEncounter
+from .system import System, TEMPLATE_COSTS
+
+
+def random_formation(combat_sys, formations):
+    return formations[int(combat_sys.rng.random() * len(formations))]
+
+
+def first_formation(combat_sys, formations):
+    return formations[0]
+
+
+def weakest_target(combat_sys, player):
+    remaining_enemies = [e for e in combat_sys.enemy_list if e.hp_current > 0]
+    return min(remaining_enemies, key=lambda e: e.hp_current)
+
+
+def strongest_target(combat_sys, player):
+    remaining_enemies = [e for e in combat_sys.enemy_list if e.hp_current > 0]
+    return max(remaining_enemies, key=lambda e: e.attack)
+
+
+FORMATION_POLICIES = {
+    'random': random_formation,
+    'first': first_formation,
+}
+
+
+# None leaves targets unset so System picks a random remaining enemy
+TARGET_POLICIES = {
+    'random': None,
+    'weakest': weakest_target,
+    'strongest': strongest_target,
+}
+
+
+ENCOUNTERS = {
+    'random': RandomEncounter,
+    'uniform': UniformEncounter,
+}
+
+
+def _percentile(counter, total, fraction):
+    threshold = fraction * total
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        if seen >= threshold:
+            return value
+    return 0
+
+
+class SimulationResult:
+    def __init__(self):
+        self.battles = 0
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.rounds = collections.Counter()
+        self.hp_remaining = collections.Counter()
+
+    def add_battle(self, combat_sys, rounds):
+        # Heals can push a mech past hp_max, count it as full health so the
+        # bucket stays a 0-100 percentage
+        hp_current = 0
+        hp_max = 0
+        for player in combat_sys.player_list:
+            hp_max += player.hp_max
+            if player.hp_current > 0:
+                hp_current += min(player.hp_current, player.hp_max)
+
+        players_alive = hp_current > 0
+        enemies_alive = any(e.hp_current > 0 for e in combat_sys.enemy_list)
+
+        self.battles += 1
+        if players_alive and not enemies_alive:
+            self.wins += 1
+        elif enemies_alive and not players_alive:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+        self.rounds[rounds] += 1
+        self.hp_remaining[100 * hp_current // hp_max] += 1
+
+    def merge(self, other):
+        self.battles += other.battles
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+        self.rounds.update(other.rounds)
+        self.hp_remaining.update(other.hp_remaining)
+
+    @property
+    def win_rate(self):
+        return self.wins / self.battles if self.battles else 0.0
+
+    def distribution(self, counter):
+        if not self.battles:
+            return {}
+
+        return {
+            'mean': sum(k * v for k, v in counter.items()) / self.battles,
+            'min': min(counter),
+            'p10': _percentile(counter, self.battles, 0.1),
+            'p50': _percentile(counter, self.battles, 0.5),
+            'p90': _percentile(counter, self.battles, 0.9),
+            'max': max(counter),
+        }
+
+    def summary(self):
+        lines = [
+            'Battles: {}'.format(self.battles),
+            'Win rate: {:.2%} (W {} / L {} / D {})'.format(
+                self.win_rate, self.wins, self.losses, self.draws
+            ),
+        ]
+        for label, counter in (('Rounds', self.rounds), ('HP remaining %', self.hp_remaining)):
+            dist = self.distribution(counter)
+            lines.append('{}: '.format(label) + ', '.join(
+                '{} {:.2f}'.format(k, v) if isinstance(v, float) else '{} {}'.format(k, v)
+                for k, v in dist.items()
+            ))
+        return '\n'.join(lines)
+
+
+def run_battle(mechs, formation_policy=random_formation, target_policy=None,
+               max_rounds=100, templates=None, template_costs=None, rng=None, encounter=None):
+    combat_sys = System(
+        mechs,
+        log=False,
+        templates=templates,
+        template_costs=template_costs,
+        rng=rng,
+        encounter=encounter
+    )
+    formations = list(itertools.product(*[mech.roles for mech in mechs]))
+
+    rounds = 0
+    while not combat_sys.is_over and rounds < max_rounds:
+        formation = formation_policy(combat_sys, formations)
+        if target_policy is not None:
+            for player, role in zip(combat_sys.player_list, formation):
+                if role == 'Single' and player.hp_current > 0:
+                    player.target = target_policy(combat_sys, player)
+                else:
+                    player.target = None
+        combat_sys.do_round(formation)
+        rounds += 1
+
+    return combat_sys, rounds
+
+
+def run_battles(num_battles, mechs=None, formation_policy=random_formation,
+                target_policy=None, max_rounds=100, num_mechs=3,
+                templates=None, template_costs=None, rng=None, encounter=None):
+    if rng is None:
+        rng = random
+    if encounter is None:
+        encounter = RandomEncounter(template_costs if template_costs is not None else TEMPLATE_COSTS)
+
+    result = SimulationResult()
+
+    for _ in range(num_battles):
+        party = mechs if mechs is not None else [Character.from_random(rng) for i in range(num_mechs)]
+        combat_sys, rounds = run_battle(
+            party, formation_policy, target_policy, max_rounds, templates, template_costs, rng,
+            encounter
+        )
+        result.add_battle(combat_sys, rounds)
+
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run headless combat simulations')
+    parser.add_argument('-n', '--battles', type=int, default=10000)
+    parser.add_argument('--mechs', type=int, default=3)
+    parser.add_argument('--formation', choices=sorted(FORMATION_POLICIES), default='random')
+    parser.add_argument('--target', choices=sorted(TARGET_POLICIES), default='random')
+    parser.add_argument('--max-rounds', type=int, default=100)
+    parser.add_argument('--encounter', choices=sorted(ENCOUNTERS), default='random')
+    parser.add_argument('--fixed-party', action='store_true',
+                        help='use one random party for every battle')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(args)
+
+    rng = random.Random(args.seed)
+
+    mechs = None
+    if args.fixed_party:
+        mechs = [Character.from_random(rng) for i in range(args.mechs)]
+
+    stime = time.perf_counter()
+    result = run_battles(
+        args.battles,
+        mechs=mechs,
+        formation_policy=FORMATION_POLICIES[args.formation],
+        target_policy=TARGET_POLICIES[args.target],
+        max_rounds=args.max_rounds,
+        num_mechs=args.mechs,
+        rng=rng,
+        encounter=ENCOUNTERS[args.encounter](TEMPLATE_COSTS),
+    )
+    elapsed = time.perf_counter() - stime
+
+    print(result.summary())
+    print('Simulation took {:.4f}s ({:.0f} battles/s)'.format(elapsed, result.battles / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import concurrent.futures
+import copy
+import itertools
+import os
+import random
+import time
+
+from character import TEMPLATES
+from .system import TEMPLATE_COSTS
+from . import simulate
+
+
+def parse_axis(text):
+    # 'heavy.cost=3,4,5' -> ('heavy.cost', [3, 4, 5])
+    path, values = text.split('=', 1)
+    return path, [int(value) for value in values.split(',')]
+
+
+def expand_grid(axes):
+    paths = list(axes.keys())
+    return [dict(zip(paths, values)) for values in itertools.product(*axes.values())]
+
+
+def apply_config(config):
+    templates = copy.deepcopy(TEMPLATES)
+    template_costs = dict(TEMPLATE_COSTS)
+
+    for path, value in config.items():
+        template_name, field = path.split('.', 1)
+        if template_name not in templates:
+            raise KeyError('Unknown template: {}'.format(template_name))
+        if field == 'cost':
+            template_costs[template_name] = value
+        else:
+            templates[template_name][field] = value
+
+    return templates, template_costs
+
+
+def _run_task(task):
+    cell_idx, config, num_battles, seed, options = task
+
+    # Each task gets its own generator, so results only depend on the seed
+    # and not on which worker picked up the task
+    rng = random.Random(seed)
+    templates, template_costs = apply_config(config)
+    result = simulate.run_battles(
+        num_battles,
+        formation_policy=simulate.FORMATION_POLICIES[options['formation']],
+        target_policy=simulate.TARGET_POLICIES[options['target']],
+        max_rounds=options['max_rounds'],
+        num_mechs=options['num_mechs'],
+        templates=templates,
+        template_costs=template_costs,
+        rng=rng,
+    )
+
+    return cell_idx, result
+
+
+def make_tasks(grid, battles_per_cell, chunk_size, seed, options):
+    tasks = []
+    for cell_idx, config in enumerate(grid):
+        for chunk_idx, start in enumerate(range(0, battles_per_cell, chunk_size)):
+            num_battles = min(chunk_size, battles_per_cell - start)
+            task_seed = '{}:{}:{}'.format(seed, cell_idx, chunk_idx)
+            tasks.append((cell_idx, config, num_battles, task_seed, options))
+    return tasks
+
+
+def run_sweep(grid, battles_per_cell=1000, jobs=None, chunk_size=500, seed=0,
+              formation='random', target='random', max_rounds=100, num_mechs=3):
+    options = {
+        'formation': formation,
+        'target': target,
+        'max_rounds': max_rounds,
+        'num_mechs': num_mechs,
+    }
+    tasks = make_tasks(grid, battles_per_cell, chunk_size, seed, options)
+    results = [simulate.SimulationResult() for _ in grid]
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1:
+        completed = map(_run_task, tasks)
+        for cell_idx, result in completed:
+            results[cell_idx].merge(result)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            for cell_idx, result in executor.map(_run_task, tasks):
+                results[cell_idx].merge(result)
+
+    return list(zip(grid, results))
+
+
+def format_table(rows):
+    paths = sorted({path for config, _ in rows for path in config})
+    header = paths + ['battles', 'win_rate', 'rounds_mean', 'rounds_p50', 'hp_mean', 'hp_p50']
+
+    table = [header]
+    for config, result in rows:
+        rounds = result.distribution(result.rounds)
+        hp_remaining = result.distribution(result.hp_remaining)
+        table.append([str(config.get(path, '')) for path in paths] + [
+            str(result.battles),
+            '{:.4f}'.format(result.win_rate),
+            '{:.2f}'.format(rounds.get('mean', 0)),
+            str(rounds.get('p50', 0)),
+            '{:.2f}'.format(hp_remaining.get('mean', 0)),
+            str(hp_remaining.get('p50', 0)),
+        ])
+
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in table
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Sweep combat balance parameters')
+    parser.add_argument('-p', '--param', action='append', default=[], type=parse_axis,
+                        help='grid axis such as heavy.cost=3,4,5 or tank.health=10,12')
+    parser.add_argument('-n', '--battles', type=int, default=1000,
+                        help='battles per grid cell')
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mechs', type=int, default=3)
+    parser.add_argument('--formation', choices=sorted(simulate.FORMATION_POLICIES), default='random')
+    parser.add_argument('--target', choices=sorted(simulate.TARGET_POLICIES), default='random')
+    parser.add_argument('--max-rounds', type=int, default=100)
+    args = parser.parse_args(args)
+
+    grid = expand_grid(dict(args.param))
+
+    stime = time.perf_counter()
+    rows = run_sweep(
+        grid,
+        battles_per_cell=args.battles,
+        jobs=args.jobs,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        formation=args.formation,
+        target=args.target,
+        max_rounds=args.max_rounds,
+        num_mechs=args.mechs,
+    )
+    elapsed = time.perf_counter() - stime
+
+    print(format_table(rows))
+    total = sum(result.battles for _, result in rows)
+    print('Sweep took {:.4f}s ({:.0f} battles/s)'.format(elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
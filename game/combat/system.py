@@ -1,6 +1,8 @@
 import random
 
 from character import Character, TEMPLATES
+from .encounters import RandomEncounter
+from .events import CombatLog, EVENT_DAMAGE, EVENT_HEAL
 
 
 TEMPLATE_COSTS = {
@@ -12,115 +14,169 @@ TEMPLATE_COSTS = {
 
 
 class Combatant:
+    # Stats are copied off the character up front so the combat loop reads
+    # plain slots instead of going through the character on every action
+    __slots__ = (
+        'name',
+        'attack',
+        'hp_max',
+        'roles',
+        'position',
+        'role',
+        'index',
+        'hp_current',
+        'target',
+        'round_target',
+        '_character',
+    )
+
     def __init__(self, name, character=None):
-        self.role = 'Single'
-        self._character = character if character else Character.from_random()
+        if not character:
+            character = Character.from_random()
 
-        self.hp_current = self.hp_max
+        self.role = 'Single'
+        self.index = -1
+        self._character = character
+
+        self.name = character.name
+        self.attack = character.attack
+        self.hp_max = self.hp_current = character.health
+        self.roles = character.roles
+        self.position = character.position
         self.target = None
-
-    @property
-    def name(self):
-        return self._character.name
-
-    @property
-    def attack(self):
-        return self._character.attack
-
-    @property
-    def hp_max(self):
-        return self._character.health
-
-    @property
-    def roles(self):
-        return self._character.roles
-
-    @property
-    def position(self):
-        return self._character.position
+        self.round_target = None
 
 
 class System:
-    def act_single(self, actor, targets):
-        if actor.hp_current > 0:
-            damage = max(1, actor.attack // 2)
-            targets[0].hp_current -= damage
-            return '{} deals {} points of damage to {}\n'.format(actor.name, damage, targets[0].name)
-        return ''
-
-    def act_aoe(self, actor, targets):
-        results = []
-        if actor.hp_current > 0:
-            damage = max(1, actor.attack // 6)
-            for target in targets:
-                target.hp_current -= damage
-                results.append('{} deals {} points of damage to {}'.format(actor.name, damage, target.name))
-        return '\n'.join(results)
-
-    def act_support(self, actor, targets):
-        results = []
-        if actor.hp_current > 0:
-            damage = max(1, actor.attack // 3)
-            for target in targets:
-                target.hp_current += damage
-                results.append('{} heals {} points of damage to {}'.format(actor.name, damage, target.name))
-        return '\n'.join(results)
-
-    def __init__(self, player_list):
-        self.player_list = [Combatant(c.name, c) for c in player_list]
+    def __init__(self, player_list, log=True, templates=None, template_costs=None, rng=None,
+                 encounter=None):
+        if rng is None:
+            rng = random
+        if templates is None:
+            templates = TEMPLATES
+        if template_costs is None:
+            template_costs = TEMPLATE_COSTS
+        if encounter is None:
+            encounter = RandomEncounter(template_costs)
+
+        self.player_list = []
+        for i, character in enumerate(player_list):
+            player = Combatant(character.name, character)
+            player.index = i
+            self.player_list.append(player)
         self.is_over = False
+        self.rng = rng
 
+        budget = len(player_list) * 4
+        # Enemies from the same template share one Character, each Combatant
+        # copies the stats it needs off it
+        characters = {}
         self.enemy_list = []
-        remaining_points = len(player_list) * 4
-        options = list(TEMPLATES.keys())
-        while remaining_points > 0:
-            choice = random.choice(options)
-            cost = TEMPLATE_COSTS[choice]
-            if cost > remaining_points:
-                continue
-            remaining_points -= cost
-            self.enemy_list.append(Character.from_template(choice))
-
-        for i, enemy in enumerate(self.enemy_list):
-            enemy.name = '({}) {}'.format(i+1, enemy.name)
-
-        self.enemy_list = [Combatant(e.name, e) for e in self.enemy_list]
+        for i, choice in enumerate(encounter.generate(budget, rng)):
+            character = characters.get(choice)
+            if character is None:
+                character = characters[choice] = Character.from_template(choice, templates)
+            enemy = Combatant(character.name, character)
+            enemy.name = '({}) {}'.format(i+1, character.name)
+            enemy.index = len(player_list) + i
+            self.enemy_list.append(enemy)
+
+        self.combatants = self.player_list + self.enemy_list
+
+        self.log = None
+        self._empty_log = None
+        if log:
+            # Worst case per round: every player affects a whole side and every
+            # enemy lands a single hit
+            side_size = max(len(self.player_list), len(self.enemy_list))
+            capacity = len(self.player_list) * side_size + len(self.enemy_list)
+            self.log = CombatLog(self.combatants, capacity)
 
     def do_round(self, formation):
-        enemy_role_list = ((enemy, 'Single') for enemy in self.enemy_list)
-        for enemy, role in enemy_role_list:
-            enemy.role = role
-
-        actions = []
-        remaining_enemies = [enemy for enemy in self.enemy_list if enemy.hp_current > 0]
-        remaining_players = [p for p in self.player_list if p.hp_current > 0]
-        for player, role in zip(self.player_list, formation):
-            if player.hp_current <=0:
+        """Run one round and return its events
+
+        The returned CombatLog is reused and cleared by the next call, copy
+        out anything that needs to outlive the round. Without logging an
+        empty log is returned.
+        """
+        rng_random = self.rng.random
+        log = self.log
+        if log is not None:
+            log.clear()
+
+        player_list = self.player_list
+        num_player_slots = len(player_list)
+        remaining_enemies = [e for e in self.enemy_list if e.hp_current > 0]
+        num_enemies = len(remaining_enemies)
+        front_enemies = None
+
+        # Random numbers are drawn in a fixed order, Single targets for
+        # players then enemies in list order, then one sort key per actor
+        # for the turn order. VectorSystem relies on this.
+        remaining_players = []
+        for player, role in zip(player_list, formation):
+            if player.hp_current <= 0:
                 continue
-            targets = remaining_enemies
             if role == 'Single':
-                if player.target:
-                    targets = [player.target]
-                else:
-                    targets = [random.choice(remaining_enemies)]
-            elif role == 'Support':
-                targets = self.player_list
-            elif role == 'AoE':
-                targets = [e for e in remaining_enemies if e.position == 'FRONT']
-                if not targets:
-                    targets = remaining_enemies
-            action = getattr(self, 'act_' + role.lower())
-            actions.append((action, (player, targets)))
-        for enemy in self.enemy_list:
-            targets = [random.choice(remaining_players)]
-            actions.append((self.act_single, (enemy, targets)))
-
-        random.shuffle(actions)
-        results = [act[0](*act[1]) for act in actions]
-
-        remaining_enemies = [enemy for enemy in self.enemy_list if enemy.hp_current > 0]
-        remaining_players = [p for p in self.player_list if p.hp_current > 0]
-
-        self.is_over = len(remaining_players) == 0 or len(remaining_enemies) == 0
+                target = player.target
+                if not target:
+                    target = remaining_enemies[int(rng_random() * num_enemies)]
+                player.round_target = target
+            elif role != 'AoE' and role != 'Support':
+                raise KeyError(role)
+            player.role = role
+            remaining_players.append(player)
+        num_players = len(remaining_players)
+        for enemy in remaining_enemies:
+            enemy.round_target = remaining_players[int(rng_random() * num_players)]
+
+        actors = remaining_players + remaining_enemies
+
+        # sort() computes one key per actor in list order
+        for actor in sorted(actors, key=lambda actor: rng_random()):
+            if actor.hp_current <= 0:
+                continue
 
-        return results
+            role = actor.role
+            if role == 'Single':
+                target = actor.round_target
+                damage = actor.attack // 2 or 1
+                hp = target.hp_current
+                target.hp_current = hp - damage
+                if 0 < hp <= damage:
+                    if target.index < num_player_slots:
+                        num_players -= 1
+                    else:
+                        num_enemies -= 1
+                if log is not None:
+                    log.append(actor.index, target.index, damage, EVENT_DAMAGE)
+            elif role == 'AoE':
+                if front_enemies is None:
+                    front_enemies = [e for e in remaining_enemies if e.position == 'FRONT'] or remaining_enemies
+                damage = actor.attack // 6 or 1
+                for target in front_enemies:
+                    hp = target.hp_current
+                    target.hp_current = hp - damage
+                    if 0 < hp <= damage:
+                        num_enemies -= 1
+                if log is not None:
+                    for target in front_enemies:
+                        log.append(actor.index, target.index, damage, EVENT_DAMAGE)
+            else:
+                heal = actor.attack // 3 or 1
+                for target in player_list:
+                    hp = target.hp_current
+                    target.hp_current = hp + heal
+                    if hp <= 0 < hp + heal:
+                        num_players += 1
+                if log is not None:
+                    for target in player_list:
+                        log.append(actor.index, target.index, heal, EVENT_HEAL)
+
+        self.is_over = not num_players or not num_enemies
+
+        if log is None:
+            if self._empty_log is None:
+                self._empty_log = CombatLog(self.combatants, 0)
+            return self._empty_log
+        return log
@@ -0,0 +1,232 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from character import Character
+from .system import System
+
+
+_SINGLE = 0
+_AOE = 1
+_SUPPORT = 2
+
+_ROLE_CODES = {
+    'Single': _SINGLE,
+    'AoE': _AOE,
+    'Support': _SUPPORT,
+}
+
+
+class VectorSystem:
+    """Array backed alternative to System for battles with many combatants
+
+    Combatants are laid out players first, then enemies, matching
+    System.combatants. do_round() draws random numbers in the same order
+    as System.do_round(), so both engines produce identical results for the
+    same seed.
+
+    Targets, turn order and damage are worked out with array operations.
+    Only the draws themselves and the turns after the first actor that
+    dies before acting go through Python, and that walk keeps running
+    totals instead of touching every hit.
+    """
+
+    def __init__(self, player_list, templates=None, template_costs=None, rng=None):
+        self._load(System(
+            player_list,
+            log=False,
+            templates=templates,
+            template_costs=template_costs,
+            rng=rng
+        ))
+
+    @classmethod
+    def from_system(cls, combat_sys):
+        result = cls.__new__(cls)
+        result._load(combat_sys)
+        return result
+
+    def _load(self, combat_sys):
+        self.player_list = combat_sys.player_list
+        self.enemy_list = combat_sys.enemy_list
+        self.num_players = len(self.player_list)
+        self.rng = combat_sys.rng
+
+        combatants = combat_sys.combatants
+        self.hp = np.array([c.hp_current for c in combatants], dtype=np.int64)
+        self.hp_max = np.array([c.hp_max for c in combatants], dtype=np.int64)
+        self.attack = np.array([c.attack for c in combatants], dtype=np.int64)
+        self.front = np.array([c.position == 'FRONT' for c in combatants], dtype=bool)
+        self.is_player = np.arange(len(combatants)) < self.num_players
+
+        self.is_over = combat_sys.is_over
+
+    @property
+    def alive(self):
+        return self.hp > 0
+
+    def sync(self):
+        """Copy array state back onto the Combatant objects"""
+        for combatant, hp in zip(self.player_list + self.enemy_list, self.hp.tolist()):
+            combatant.hp_current = hp
+
+    def do_round(self, formation):
+        rng_random = self.rng.random
+        num_players = self.num_players
+        hp = self.hp
+        num_combatants = len(hp)
+        alive = hp > 0
+
+        roles = np.full(num_combatants, _SINGLE, dtype=np.int64)
+        roles[:num_players] = [_ROLE_CODES[role] for role in formation]
+        targets = np.full(num_combatants, -1, dtype=np.int64)
+        targets[:num_players] = [p.target.index if p.target else -1 for p in self.player_list]
+
+        remaining_players = np.flatnonzero(alive[:num_players])
+        remaining_enemies = np.flatnonzero(alive[num_players:]) + num_players
+
+        # Same draw order as System.do_round(): Single targets for players,
+        # then for enemies, then one turn order key per actor
+        pick_players = remaining_players[
+            (roles[remaining_players] == _SINGLE) & (targets[remaining_players] < 0)
+        ]
+        num_picks = len(pick_players) + len(remaining_enemies)
+        actors = np.concatenate([remaining_players, remaining_enemies])
+        draws = np.array([rng_random() for _ in range(num_picks + len(actors))])
+
+        picks = draws[:len(pick_players)] * len(remaining_enemies)
+        targets[pick_players] = remaining_enemies[picks.astype(np.int64)]
+        picks = draws[len(pick_players):num_picks] * len(remaining_players)
+        targets[remaining_enemies] = remaining_players[picks.astype(np.int64)]
+
+        order = actors[np.argsort(draws[num_picks:], kind='stable')]
+        num_actions = len(order)
+        turn_roles = roles[order]
+        turn_targets = targets[order]
+        attack = self.attack[order]
+        amounts = np.where(
+            turn_roles == _SINGLE, attack // 2,
+            np.where(turn_roles == _AOE, attack // 6, attack // 3)
+        )
+        np.maximum(amounts, 1, out=amounts)
+
+        in_front = np.zeros(num_combatants, dtype=bool)
+        front_enemies = remaining_enemies[self.front[remaining_enemies]]
+        in_front[front_enemies if len(front_enemies) else remaining_enemies] = True
+        is_player = self.is_player
+
+        # AoE always hits the whole front row and Support the whole party,
+        # so their effect before a turn is a running total. Single hits land
+        # on one target each.
+        aoe = np.where(turn_roles == _AOE, amounts, 0)
+        heal = np.where(turn_roles == _SUPPORT, amounts, 0)
+        aoe_before = np.cumsum(aoe) - aoe
+        heal_before = np.cumsum(heal) - heal
+        singles = np.flatnonzero(turn_roles == _SINGLE)
+        single_targets = turn_targets[singles]
+        single_damage = amounts[singles]
+
+        # Hit points of each actor at its turn, assuming everyone alive at
+        # the start of the round gets to act
+        turn_of = np.full(num_combatants, num_actions, dtype=np.int64)
+        turn_of[order] = np.arange(num_actions)
+        hit_before = singles < turn_of[single_targets]
+        single_before = np.bincount(
+            single_targets[hit_before], weights=single_damage[hit_before], minlength=num_combatants
+        ).astype(np.int64)
+        hp_at = (
+            hp[order] - single_before[order]
+            - in_front[order] * aoe_before
+            + is_player[order] * heal_before
+        )
+
+        skipped = np.flatnonzero(hp_at <= 0)
+        if not len(skipped):
+            self.hp = (
+                hp - np.bincount(single_targets, weights=single_damage, minlength=num_combatants).astype(np.int64)
+                - in_front * aoe.sum()
+                + is_player * heal.sum()
+            )
+        else:
+            # Turns before the first skipped one are settled, walk the rest in
+            # order keeping the running totals up to date
+            first = skipped[0]
+            settled = singles < first
+            single_total = np.bincount(
+                single_targets[settled], weights=single_damage[settled], minlength=num_combatants
+            ).astype(np.int64).tolist()
+            aoe_total = int(aoe_before[first])
+            heal_total = int(heal_before[first])
+            hp_start = hp.tolist()
+            front_list = in_front.tolist()
+            for actor, role, target, amount in zip(
+                order[first:].tolist(),
+                turn_roles[first:].tolist(),
+                turn_targets[first:].tolist(),
+                amounts[first:].tolist()
+            ):
+                actor_hp = hp_start[actor] - single_total[actor]
+                if front_list[actor]:
+                    actor_hp -= aoe_total
+                elif actor < num_players:
+                    actor_hp += heal_total
+                if actor_hp <= 0:
+                    continue
+                if role == _SINGLE:
+                    single_total[target] += amount
+                elif role == _AOE:
+                    aoe_total += amount
+                else:
+                    heal_total += amount
+
+            self.hp = hp - np.array(single_total, dtype=np.int64) - in_front * aoe_total + is_player * heal_total
+
+        alive = self.hp > 0
+        self.is_over = not alive[:num_players].any() or not alive[num_players:].any()
+
+
+def _time_rounds(engine, num_players, num_rounds, seed):
+    roles = ['Single', 'AoE', 'Support']
+    rng = random.Random(seed)
+    formation_rng = random.Random(seed + 1)
+
+    elapsed = 0.0
+    rounds = 0
+    while rounds < num_rounds:
+        mechs = [Character.from_random(rng) for i in range(num_players)]
+        if engine == 'vector':
+            combat_sys = VectorSystem(mechs, rng=rng)
+        else:
+            combat_sys = System(mechs, log=False, rng=rng)
+
+        while not combat_sys.is_over and rounds < num_rounds:
+            formation = [formation_rng.choice(roles) for i in range(num_players)]
+            stime = time.perf_counter()
+            combat_sys.do_round(formation)
+            elapsed += time.perf_counter() - stime
+            rounds += 1
+
+    return elapsed / rounds
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Compare round times of System and VectorSystem')
+    parser.add_argument('--players', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(args)
+
+    for num_players in args.players:
+        times = {
+            engine: _time_rounds(engine, num_players, args.rounds, args.seed)
+            for engine in ('system', 'vector')
+        }
+        print('{} players: System {:.3f}ms/round, VectorSystem {:.3f}ms/round'.format(
+            num_players, times['system'] * 1000, times['vector'] * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
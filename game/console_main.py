@@ -94,8 +94,8 @@ def main():
 
         clear()
         results = combat_sys.do_round(formation)
-        for result in results:
-            print(result)
+        for line in results.lines():
+            print(line)
         input('Press enter to continue')
 
     clear()
@@ -10,15 +10,23 @@ import panda3d.core as p3d
 
 from character import Character
 import combat
+import savefile
 
 
 class SaveData:
-    def __init__(self):
+    def __init__(self, rng=None):
         names = ('Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon')
-        self.mechs = [Character.from_random() for i in range(3)]
+        self.mechs = [Character.from_random(rng) for i in range(3)]
         for i, character in enumerate(self.mechs):
             character.name = names[i%len(names)]
 
+        # Path and encoded mech records from the last write
+        self._saved_path = None
+        self._saved_records = []
+
+    def _encode_mechs(self):
+        return [savefile.encode_record(mech.serialize()) for mech in self.mechs]
+
     def serialize(self):
         d = {
             'mechs': [mech.serialize() for mech in self.mechs],
@@ -33,16 +41,45 @@ class SaveData:
             else:
                 print("Warning: Unknown field to deserialize into SaveData: {}".format(key))
 
-    def write(self, fpath):
-        with open(fpath, 'w') as f:
-            json.dump(self.serialize(), f)
+    def write(self, fpath, force=False, writer=None):
+        # Comparing freshly encoded records catches any change to a mech,
+        # including in-place edits, without tracking writes on Character.
+        # Returns 0 when nothing changed since the last write to fpath.
+        records = self._encode_mechs()
+        if not force and fpath == self._saved_path and records == self._saved_records:
+            return 0
+
+        # Encoding happens here so a background writer gets a snapshot, only
+        # the file I/O happens on its thread
+        data = savefile.pack_records(records)
+        if writer is None:
+            savefile.write_atomic(fpath, data)
+        else:
+            writer.submit(fpath, data, on_error=self._write_failed)
+
+        self._saved_path = fpath
+        self._saved_records = records
+        return len(data)
+
+    def _write_failed(self, error):
+        # Called from the writer thread, make the next save rewrite everything
+        self._saved_path = None
 
     @classmethod
     def from_file(cls, fpath):
         sd = cls()
 
-        with open(fpath) as f:
-            sd.deserialize(json.load(f))
+        with open(fpath, 'rb') as f:
+            data = f.read()
+
+        if data.startswith(savefile.MAGIC):
+            encoded = savefile.unpack_records(data)
+            sd.deserialize({'mechs': [savefile.decode_record(i) for i in encoded]})
+            sd._saved_path = fpath
+            sd._saved_records = encoded
+        else:
+            # Saves from before the binary format
+            sd.deserialize(json.loads(data.decode('utf-8')))
 
         return sd
 
@@ -56,6 +93,8 @@ class GameUI:
     ]
 
     def __init__(self):
+        self.pool = gui.WidgetPool()
+
         for idx,root in enumerate(self._roots):
             setattr(self, root[0], gui.Frame(
                 parent=getattr(base, root[1]),
@@ -69,6 +108,7 @@ class GameUI:
             gui.global_theme = gui.Theme.from_file('style.theme')
 
     def cleanup(self):
+        self.pool.clear()
         for root in self._roots:
             getattr(self, root[0]).destroy()
 
@@ -110,11 +150,12 @@ class TitleUI(GameUI):
 
     def setup_selections(self, selections, select_cb):
         for i in self._selection_items:
-            i.destroy()
+            self.pool.release(i)
         self._selection_items = []
 
         for idx, selection in enumerate(selections):
-            btn = gui.Button(
+            btn = self.pool.acquire(
+                gui.Button,
                 parent=self.root,
                 style='button_general',
                 command=select_cb,
@@ -127,31 +168,95 @@ class TitleUI(GameUI):
 
 
 class TitleState(GameState):
+    slots_per_page = 7
+
     def __init__(self):
         super().__init__(TitleUI)
 
-        options = [
+        self.options = [
             "New Game",
             "Continue",
+            "Load Game",
             "Exit",
         ]
-
+        self.slot_options = {}
+        self.slot_page = 0
+
+        self.ui.setup_selections(self.options, self.do_selection)
+
+    def load_slot(self, slot):
+        base.save_writer.flush()
+        fpath = base.save_slots.path(slot)
+        print("Loading save data from", fpath)
+        try:
+            save_data = SaveData.from_file(fpath)
+        except (OSError, ValueError, savefile.SaveFileError) as e:
+            # ValueError covers broken legacy JSON saves (including bad UTF-8)
+            print("Warning: could not load save {}, removing it from the list: {}".format(fpath, e))
+            base.save_slots.remove(slot)
+            return False
+
+        base.save_data = save_data
+        base.save_slot = slot
+        base.auto_save = True
+        base.change_state(MainState)
+        return True
+
+    def show_slots(self, page=0):
+        # Only the index is read here, saves are loaded when picked
+        slots = base.save_slots.list()
+        page = min(page, max(len(slots) - 1, 0) // self.slots_per_page)
+        start = page * self.slots_per_page
+        self.slot_page = page
+        self.slot_options = OrderedDict()
+        for slot in slots[start:start + self.slots_per_page]:
+            label = '{}: {}'.format(slot['slot'], ', '.join(slot['mechs']))
+            self.slot_options[label] = slot['slot']
+
+        # Page controls plus Back keep the list within the ten selection keys
+        options = list(self.slot_options)
+        if page > 0:
+            options.append("Previous Page")
+        if start + self.slots_per_page < len(slots):
+            options.append("Next Page")
+        options.append("Back")
         self.ui.setup_selections(options, self.do_selection)
 
     def do_selection(self, option):
-        if option == "New Game":
+        if option in self.slot_options:
+            if not self.load_slot(self.slot_options[option]):
+                self.show_slots(self.slot_page)
+        elif option == "Previous Page":
+            self.show_slots(self.slot_page - 1)
+        elif option == "Next Page":
+            self.show_slots(self.slot_page + 1)
+        elif option == "Back":
+            self.slot_options = {}
+            self.ui.setup_selections(self.options, self.do_selection)
+        elif option == "New Game":
             base.save_data = SaveData()
+            base.save_slot = base.save_slots.new_slot()
             base.auto_save = True
             base.change_state(MainState)
         elif option == "Continue":
+            # Fall back to older slots if the latest one cannot be loaded
+            for slot in base.save_slots.list():
+                if self.load_slot(slot['slot']):
+                    return
+
             if os.path.exists('default.sav'):
+                # Saves from before save slots, further saves go to a slot
                 print("Loading save data from", "default.sav")
                 base.save_data = SaveData.from_file('default.sav')
+                base.save_slot = 'default'
             else:
                 print("Could not find save file, creating a new save")
                 base.save_data = SaveData()
+                base.save_slot = base.save_slots.new_slot()
             base.auto_save = True
             base.change_state(MainState)
+        elif option == "Load Game":
+            self.show_slots()
         elif option == "Options":
             print("Options not implemented")
         elif option == "Exit":
@@ -174,11 +279,12 @@ class MainUI(GameUI):
 
     def setup_selections(self, selections, select_cb):
         for i in self._selection_items:
-            i.destroy()
+            self.pool.release(i)
         self._selection_items = []
 
         for idx, selection in enumerate(selections):
-            btn = gui.Button(
+            btn = self.pool.acquire(
+                gui.Button,
                 parent=self.root_left,
                 style='button_general',
                 command=select_cb,
@@ -191,42 +297,50 @@ class MainUI(GameUI):
 
     def setup_status(self, mechs, back_cb=None, back_args=[]):
         for i in self._mech_frames:
-            i.destroy()
+            for child in (i.label, i.hp, i.attack, i.roles):
+                self.pool.release(child)
+            self.pool.release(i)
         self._mech_frames = []
 
         if self._back_btn:
-            self._back_btn.destroy()
+            self.pool.release(self._back_btn)
+            self._back_btn = None
 
         for idx, mech in enumerate(mechs):
-            frame = gui.Frame(
+            frame = self.pool.acquire(
+                gui.Frame,
                 parent=self.root,
                 frame_color=(0.3, 0.3, 0.3, 0.5),
                 frame_size=(-0.9, 0.9, -0.20, 0.20),
                 pos=(0.0, 0.0, 0.70 - 0.50 * idx)
             )
 
-            frame.label = gui.Label(
+            frame.label = self.pool.acquire(
+                gui.Label,
                 parent=frame,
                 style='text_base',
                 text=mech.name,
                 pos=(-0.85, 0, 0.15)
             )
 
-            frame.hp = gui.Label(
+            frame.hp = self.pool.acquire(
+                gui.Label,
                 parent=frame,
                 style='text_base',
                 text="HP: {}".format(mech.health),
                 pos=(-0.80, 0, 0.05)
             )
 
-            frame.attack = gui.Label(
+            frame.attack = self.pool.acquire(
+                gui.Label,
                 parent=frame,
                 style='text_base',
                 text="ATK: {}".format(mech.health),
                 pos=(-0.30, 0, 0.05)
             )
 
-            frame.roles = gui.Label(
+            frame.roles = self.pool.acquire(
+                gui.Label,
                 parent=frame,
                 style='text_base',
                 text="Roles: {}".format(', '.join(mech.roles)),
@@ -236,7 +350,8 @@ class MainUI(GameUI):
             self._mech_frames.append(frame)
 
         if back_cb:
-            self._back_btn = gui.Button(
+            self._back_btn = self.pool.acquire(
+                gui.Button,
                 parent=self.root,
                 style='button_general',
                 command=back_cb,
@@ -275,9 +390,8 @@ class MainState(GameState):
         if self.substate == 'main':
             self.ui.setup_selections(self.options, self.do_selection)
             self.ui.setup_status([])
-            if base.auto_save:
-                print("Auto saving...")
-                base.save_data.write('default.sav')
+            if base.auto_save and base.save_slots.save(base.save_slot, base.save_data, writer=base.save_writer):
+                print("Auto saved to slot", base.save_slot)
         elif self.substate == 'status':
             self.ui.setup_selections([], None)
             self.ui.setup_status(base.save_data.mechs, self.change_substate, ['main'])
@@ -288,8 +402,10 @@ class MainState(GameState):
         elif option == "Mech Status":
             self.change_substate('status')
         elif option == "Save":
-            print("Saving to default.sav")
-            base.save_data.write('default.sav')
+            if base.save_slot is None:
+                base.save_slot = base.save_slots.new_slot()
+            print("Saving to slot", base.save_slot)
+            base.save_slots.save(base.save_slot, base.save_data, force=True, writer=base.save_writer)
             base.auto_save = True
         elif option == "Exit":
             sys.exit()
@@ -303,8 +419,10 @@ class CombatUI(GameUI):
 
         self._pcs = OrderedDict()
         self._ecs = OrderedDict()
+        self._shown_hp = {}
 
         self._selection_frame = None
+        self._selection_label = None
         self._selection_items = []
 
     def _create_pc_frame(self, n):
@@ -400,26 +518,36 @@ class CombatUI(GameUI):
         for i in range(len(self._ecs), 12):
             self._create_ec_frame(i, empty=True)
 
+        for frames in (self._pcs, self._ecs):
+            for combatant, ui in frames.items():
+                ui.label.text = combatant.name
+                ui.attacklabel.text = 'ATK: {}'.format(combatant.attack)
+                self._update_hp(ui, combatant)
+
     def setup_selections(self, title, selections, select_cb):
         if self._selection_frame:
-            self._selection_frame.destroy()
+            self.pool.release(self._selection_label)
+            self.pool.release(self._selection_frame)
             self._selection_frame = None
+            self._selection_label = None
 
             for i in self._selection_items:
-                i.destroy()
+                self.pool.release(i)
             self._selection_items = []
 
         num_items = len(selections)
         frame_size = num_items / 10.0 + 0.06
 
-        self._selection_frame = gui.Frame(
+        self._selection_frame = self.pool.acquire(
+            gui.Frame,
             parent=self.root,
             frame_color=(0.8, 0.8, 0.8, 0.5),
             frame_size=(-0.25, 0.25, 0.0, frame_size),
             pos=(0, 0, -1.0)
         )
 
-        gui.Label(
+        self._selection_label = self.pool.acquire(
+            gui.Label,
             parent=self._selection_frame,
             text=title,
             text_scale=(0.05, 0.05),
@@ -428,7 +556,8 @@ class CombatUI(GameUI):
         )
 
         for idx, selection in enumerate(selections):
-            btn = gui.Button(
+            btn = self.pool.acquire(
+                gui.Button,
                 parent=self.root,
                 style='button_combat',
                 command=select_cb,
@@ -439,20 +568,16 @@ class CombatUI(GameUI):
             )
             self._selection_items.append(btn)
 
-    def update_combatants(self, player_combatants, enemy_combatants):
-        for combatant in player_combatants:
-            ui = self._pcs[combatant]
-            ui.label.text = combatant.name
-            ui.hpbar.value = int(combatant.hp_current / combatant.hp_max * 100)
-            ui.hpbar.text = '{}/{}'.format(int(combatant.hp_current), combatant.hp_max)
-            ui.attacklabel.text = 'ATK: {}'.format(combatant.attack)
+    def _update_hp(self, ui, combatant):
+        self._shown_hp[combatant] = combatant.hp_current
+        ui.hpbar.value = int(combatant.hp_current / combatant.hp_max * 100)
+        ui.hpbar.text = '{}/{}'.format(int(combatant.hp_current), combatant.hp_max)
 
-        for combatant in enemy_combatants:
-            ui = self._ecs[combatant]
-            ui.label.text = combatant.name
-            ui.hpbar.value = int(combatant.hp_current / combatant.hp_max * 100)
-            ui.hpbar.text = '{}/{}'.format(int(combatant.hp_current), combatant.hp_max)
-            ui.attacklabel.text = 'ATK: {}'.format(combatant.attack)
+    def update_combatants(self, player_combatants, enemy_combatants):
+        for combatants, frames in ((player_combatants, self._pcs), (enemy_combatants, self._ecs)):
+            for combatant in combatants:
+                if self._shown_hp.get(combatant) != combatant.hp_current:
+                    self._update_hp(frames[combatant], combatant)
 
 
 class CombatState(GameState):
@@ -466,7 +591,7 @@ class CombatState(GameState):
         scene.reparent_to(self.root_node)
 
         self.selected_formation = None
-        self.selected_targets = False
+        self.current_player = None
 
         if base.save_data is None:
             print("Warning: No save data in combat state, using random mechs")
@@ -477,7 +602,6 @@ class CombatState(GameState):
         self.player_characters = save_data.mechs
 
         self.formations = []
-        self.formation_idx = -1
         for i in self.player_characters[0].roles:
             for j in self.player_characters[1].roles:
                 for k in self.player_characters[2].roles:
@@ -524,57 +648,66 @@ class CombatState(GameState):
         self.accept('selection9', self.select_item, [8])
         self.accept('selection0', self.select_item, [9])
 
-    def select_item(self, idx):
-        self.formation_idx = idx
-
-    def run(self, dt):
-        current_player = None
-        for player in self.combat_sys.player_list:
-            if player.role == 'Single' and player.target == None and player.hp_current > 0:
-                current_player = player
-                break
-        else:
-            self.selected_targets = True
+        self.show_formations()
 
+    def select_item(self, idx):
         if self.combat_sys.is_over:
-            base.change_state(MainState)
             return
-        elif self.formation_idx != -1 and self.selected_formation == None:
-            self.selected_formation = self.formations[self.formation_idx]
+
+        if self.selected_formation is None:
+            if idx >= len(self.formations):
+                return
+            self.selected_formation = self.formations[idx]
             for player, role in zip(self.combat_sys.player_list, self.selected_formation):
                 player.role = role
-            self.formation_idx = -1
-            self.selected_targets = False
-        elif self.selected_formation:
-            if self.formation_idx != -1 and not self.selected_targets:
-                current_player.target = self.combat_sys.enemy_list[self.formation_idx]
-                self.formation_idx = -1
-            elif not self.selected_targets and self.formation_idx == -1:
-                #print('Select target for {}'.format(current_player.name))
+        else:
+            if idx >= len(self.combat_sys.enemy_list):
+                return
+            self.current_player.target = self.combat_sys.enemy_list[idx]
+
+        self.advance()
+
+    def show_formations(self):
+        self.selected_formation = None
+        self.current_player = None
+        self.ui.setup_selections('Select Formation', self.formation_items, self.select_item)
+
+    def advance(self):
+        for player in self.combat_sys.player_list:
+            if player.role == 'Single' and player.target == None and player.hp_current > 0:
+                self.current_player = player
                 self.ui.setup_selections(
-                    'Select Target for {}'.format(current_player.name),
+                    'Select Target for {}'.format(player.name),
                     [i.name for i in self.combat_sys.enemy_list],
                     self.select_item
                 )
-            elif self.selected_targets:
-                results = self.combat_sys.do_round(self.selected_formation)
-                self.selected_formation = None
-                for player in self.combat_sys.player_list:
-                    player.target = None
-                    np = self.root_node.find('**/players/' + player.name)
-                    if player.hp_current > 0:
-                        np.show()
-                    else:
-                        np.hide()
-                for result in results:
-                    print(result)
-                for enemy in self.combat_sys.enemy_list:
-                    np = self.root_node.find('**/enemies/'+enemy.name)
-                    if enemy.hp_current > 0:
-                        np.show()
-                    else:
-                        np.hide()
-        else:
-            self.ui.setup_selections('Select Formation', self.formation_items, self.select_item)
+                return
+
+        self.resolve_round()
+
+    def resolve_round(self):
+        results = self.combat_sys.do_round(self.selected_formation)
+        for player in self.combat_sys.player_list:
+            player.target = None
+            np = self.root_node.find('**/players/' + player.name)
+            if player.hp_current > 0:
+                np.show()
+            else:
+                np.hide()
+        for line in results.lines():
+            print(line)
+        for enemy in self.combat_sys.enemy_list:
+            np = self.root_node.find('**/enemies/'+enemy.name)
+            if enemy.hp_current > 0:
+                np.show()
+            else:
+                np.hide()
 
         self.ui.update_combatants(self.combat_sys.player_list, self.combat_sys.enemy_list)
+
+        if not self.combat_sys.is_over:
+            self.show_formations()
+
+    def run(self, dt):
+        if self.combat_sys.is_over:
+            base.change_state(MainState)
@@ -1,7 +1,13 @@
+import hashlib
+import os
+import pickle
+
 import yaml
 import direct.gui.DirectGui as dgui
 import panda3d.core as p3d
 
+import savefile
+
 
 DGG = dgui.DGG
 
@@ -17,10 +23,61 @@ class ParameterError(Error):
 global_theme = None
 
 
+# Bump when the layout of compiled theme cache files changes
+_THEME_CACHE_VERSION = 1
+
+
+_UNSET = object()
+
+# Widgets with DirectGui option changes waiting for the next flush
+_dirty_widgets = set()
+_flush_task = None
+
+
+def theme_cache_dir():
+    # The game directory is read-only once packaged, so compiled themes go
+    # to the per-user application data directory instead
+    appdata = p3d.Filename.get_user_appdata_directory().to_os_specific()
+    return os.path.join(appdata, 'hydrogen', 'cache')
+
+
+def flush_widgets():
+    while _dirty_widgets:
+        _dirty_widgets.pop().flush()
+
+
+def _flush_widgets_task(task):
+    flush_widgets()
+    return task.cont
+
+
+def _schedule_flush(widget):
+    global _flush_task
+
+    _dirty_widgets.add(widget)
+    if _flush_task is None:
+        # Run after game state updates but before the frame is rendered
+        _flush_task = base.taskMgr.add(_flush_widgets_task, 'GUI Flush', sort=40)
+
+
+def _convert_param(attr, value):
+    if attr == 'text_scale':
+        value = tuple(value)
+    elif attr == 'text_align' and isinstance(value, str):
+        value = getattr(p3d.TextNode, value)
+    elif attr == 'relief' and isinstance(value, str):
+        value = getattr(DGG, value.upper())
+
+    return value
+
+
 class Theme(object):
     def __init__(self):
         self.props = {}
 
+        # (style, widget type) -> converted parameters ready to apply
+        self._compiled = {}
+
     def has_style(self, style):
         return style in self.props
 
@@ -38,19 +95,110 @@ class Theme(object):
 
     def set_property(self, style, prop, value):
         self.props[style][prop] = value
+        self._compiled.clear()
+
+    def _resolve_style(self, style):
+        props = self.props[style]
+        if '<<' not in props:
+            return props
+
+        # Handle merge keys for themes that did not come through the YAML
+        # loader, earlier merged mappings take precedence
+        merges = props['<<']
+        if isinstance(merges, dict):
+            merges = [merges]
+
+        resolved = {}
+        for merge in reversed(merges):
+            resolved.update(merge)
+        resolved.update(props)
+        del resolved['<<']
+
+        return resolved
+
+    def get_params(self, style, widget_type):
+        key = (style, widget_type)
+        try:
+            return self._compiled[key]
+        except KeyError:
+            pass
+
+        param_map = widget_type._direct_param_map
+        params = {
+            prop: _convert_param(prop, value)
+            for prop, value in self._resolve_style(style).items()
+            if prop in param_map
+        }
+        self._compiled[key] = params
+
+        return params
 
     @classmethod
     def from_dictionary(cls, dictionary):
         theme = cls()
         theme.props = dictionary
+        theme._compiled.clear()
 
         return theme
 
     @classmethod
-    def from_file(cls, filepath):
-        print("Loading from file", filepath)
-        with open(filepath) as f:
-            return cls.from_dictionary(yaml.load(f))
+    def from_file(cls, filepath, use_cache=True):
+        if not use_cache:
+            print("Loading from file", filepath, "using", yaml.__loader_backend__, "YAML loader")
+            with open(filepath, 'rb') as f:
+                return cls.from_dictionary(yaml.fast_load(f))
+
+        cache_path = os.path.join(theme_cache_dir(), os.path.basename(filepath) + 'c')
+        stat = os.stat(filepath)
+
+        cache = None
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except Exception:
+            # Unpickling can fail in many ways (truncated file, stale class
+            # references, garbage), any of them just means a cache miss
+            pass
+
+        if not (
+            isinstance(cache, dict) and
+            cache.get('version') == _THEME_CACHE_VERSION and
+            {'mtime', 'size', 'hash'} <= cache.keys() and
+            isinstance(cache.get('props'), dict)
+        ):
+            cache = None
+
+        if cache is not None and (cache['mtime'], cache['size']) == (stat.st_mtime_ns, stat.st_size):
+            return cls.from_dictionary(cache['props'])
+
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+
+        if cache is not None and cache['hash'] == digest:
+            # Touched but not modified, keep the props and refresh the stamp
+            props = cache['props']
+        else:
+            print("Loading from file", filepath, "using", yaml.__loader_backend__, "YAML loader")
+            props = yaml.fast_load(data)
+
+        cls._write_cache(cache_path, {
+            'version': _THEME_CACHE_VERSION,
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': digest,
+            'props': props,
+        })
+
+        return cls.from_dictionary(props)
+
+    @staticmethod
+    def _write_cache(cache_path, cache):
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            savefile.write_atomic(cache_path, pickle.dumps(cache, pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print("Warning: could not write theme cache {}: {}".format(cache_path, e))
 
 
 class Widget(object):
@@ -91,6 +239,10 @@ class Widget(object):
     }
 
     def __init__(self, dgui_widget, parent, style=None, theme=None, **params):
+        # Last values written to DirectGui and values still waiting to be written
+        self._values = {}
+        self._pending = {}
+
         if isinstance(parent, Widget):
             parent = parent._dgui_widget
         self._dgui_widget = dgui_widget(parent=parent)
@@ -105,26 +257,27 @@ class Widget(object):
             print("Warning: style not found in current theme: {}".format(style))
             theme = None
 
-        if theme is not None:
-            theme_params = {
-                i: theme.get_property(style, i)
-                for i in self._direct_param_map
-                if theme.has_property(style, i) and i not in params
-            }
-        else:
-            theme_params = {}
+        for param in params:
+            if param not in self._direct_param_map and not hasattr(self, param):
+                raise ParameterError("Unknown parameter: {}".format(param))
 
-        theme_params.update(params)
-        params = theme_params
+        if theme is not None:
+            params = dict(theme.get_params(style, type(self)), **params)
 
-        for param in sorted(params.keys()):
-            if not hasattr(self, param):
-                raise ParameterError("Unknown parameter: {}".format(param))
+        for param, value in params.items():
+            setattr(self, param, value)
 
-            setattr(self, param, params[param])
+        self.flush()
 
     def __getattr__(self, attr):
-        if attr == 'pos':
+        if attr in ('_values', '_pending'):
+            raise AttributeError(attr)
+
+        if attr in self._pending:
+            return self._pending[attr]
+        elif attr in self._values:
+            return self._values[attr]
+        elif attr == 'pos':
             return self._dgui_widget.get_pos()
         elif attr == 'hpr':
             return self._dgui_widget.get_hpr()
@@ -147,9 +300,6 @@ class Widget(object):
         else:
             raise AttributeError("%r object has no attribute %r" % (self.__class__.__name__, attr))
 
-        if attr.split('_')[0] in ('image', 'text', 'geom'):
-            self._dgui_widget.resetFrameSize()
-
     def __setattr__(self, attr, value):
         #print(self.__class__.__name__, attr, value, type(value))
         if attr == 'pos':
@@ -159,17 +309,54 @@ class Widget(object):
         elif attr == 'parent':
             self._dgui_widget.set_parent(value)
         elif attr in self._direct_param_map:
-            if attr == 'text_scale':
-                value = tuple(value)
-            elif attr == 'text_align' and isinstance(value, str):
-                value = getattr(p3d.TextNode, value)
-            elif attr == 'relief' and isinstance(value, str):
-                value = getattr(DGG, value.upper())
-            self._dgui_widget[self._direct_param_map[attr]] = value
+            value = _convert_param(attr, value)
+
+            current = self._values.get(attr, _UNSET)
+            if current is not _UNSET and current == value:
+                # No-op write, also drops any change queued since the last flush
+                self._pending.pop(attr, None)
+                return
+
+            self._pending[attr] = value
+            _schedule_flush(self)
         else:
             super().__setattr__(attr, value)
 
+    def flush(self):
+        _dirty_widgets.discard(self)
+        if not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = {}
+
+        # The DirectGui widget can be destroyed along with a parent (e.g., a
+        # GameUI root) while writes are still queued, drop them
+        if self._dgui_widget.isEmpty():
+            return
+
+        # A single configure() call lets DirectGui run each option's
+        # update function (e.g. text regeneration) once for the whole batch
+        self._dgui_widget.configure(**{
+            self._direct_param_map[attr]: value
+            for attr, value in pending.items()
+        })
+        self._values.update(pending)
+
+    def reparent_to(self, parent):
+        if isinstance(parent, Widget):
+            parent = parent._dgui_widget
+        self._dgui_widget.reparent_to(parent)
+
+    def show(self):
+        self._dgui_widget.show()
+
+    def hide(self):
+        self._dgui_widget.hide()
+
     def destroy(self):
+        _dirty_widgets.discard(self)
+        self._pending = {}
         self._dgui_widget.destroy()
 
 
@@ -219,3 +406,34 @@ class Label(Widget):
         super().__init__(dgui.DirectLabel, parent, style, theme, **params)
 
 
+class WidgetPool(object):
+    def __init__(self):
+        self._free = {}
+
+    def acquire(self, widget_type, parent, style=None, **params):
+        # Only widgets built from the same style and the same set of
+        # parameters are interchangeable, everything else gets rebound
+        key = (widget_type, style, frozenset(params))
+        free = self._free.get(key)
+
+        if free:
+            widget = free.pop()
+            widget.reparent_to(parent)
+            for param, value in params.items():
+                setattr(widget, param, value)
+            widget.show()
+        else:
+            widget = widget_type(parent, style=style, **params)
+            widget._pool_key = key
+
+        return widget
+
+    def release(self, widget):
+        widget.hide()
+        self._free.setdefault(widget._pool_key, []).append(widget)
+
+    def clear(self):
+        for widgets in self._free.values():
+            for widget in widgets:
+                widget.destroy()
+        self._free = {}
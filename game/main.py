@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import atexit
 import os
 import sys
 
@@ -11,6 +12,8 @@ import blenderpanda
 from bamboo.inputmapper import InputMapper
 
 import gamestates
+import savefile
+import saveslots
 
 
 p3d.load_prc_file_data(
@@ -41,7 +44,13 @@ class GameApp(ShowBase):
         self.inputmapper = InputMapper('config/input.conf')
 
         self.save_data = None
+        self.save_slot = None
+        self.save_slots = saveslots.SaveSlots()
         self.auto_save = False
+        self.save_writer = savefile.SaveWriter()
+
+        # Make sure queued saves hit the disk before the process goes away
+        atexit.register(self.save_writer.close)
 
         self.current_state = None
         self.change_state(gamestates.TitleState)
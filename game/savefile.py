@@ -0,0 +1,240 @@
+import os
+import struct
+import tempfile
+import threading
+
+
+MAGIC = b'HSAV'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHI')
+_FLOAT = struct.Struct('<d')
+
+
+class SaveFileError(Exception):
+    pass
+
+
+def _pack_varint(value):
+    # Unsigned LEB128, so small lengths and stats take a single byte
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _unpack_varint(data, offset):
+    result = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise SaveFileError("Unexpected end of data")
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+
+def _encode(value, out):
+    if value is None:
+        out.append(b'N')
+    elif value is True:
+        out.append(b'T')
+    elif value is False:
+        out.append(b'F')
+    elif isinstance(value, int):
+        # Zigzag so negative numbers stay short
+        out.append(b'i')
+        out.append(_pack_varint(value << 1 if value >= 0 else (-value << 1) - 1))
+    elif isinstance(value, float):
+        out.append(b'f')
+        out.append(_FLOAT.pack(value))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out.append(b's')
+        out.append(_pack_varint(len(data)))
+        out.append(data)
+    elif isinstance(value, (list, tuple)):
+        out.append(b'l')
+        out.append(_pack_varint(len(value)))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out.append(b'd')
+        out.append(_pack_varint(len(value)))
+        for key, item in value.items():
+            _encode(str(key), out)
+            _encode(item, out)
+    else:
+        raise SaveFileError("Cannot encode value of type {}".format(type(value).__name__))
+
+
+def _decode(data, offset):
+    tag = data[offset:offset+1]
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    elif tag == b'T':
+        return True, offset
+    elif tag == b'F':
+        return False, offset
+    elif tag == b'i':
+        value, offset = _unpack_varint(data, offset)
+        return (value >> 1) ^ -(value & 1), offset
+    elif tag == b'f':
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+    elif tag == b's':
+        length, offset = _unpack_varint(data, offset)
+        if offset + length > len(data):
+            raise SaveFileError("Unexpected end of data")
+        return data[offset:offset+length].decode('utf-8'), offset + length
+    elif tag == b'l':
+        count, offset = _unpack_varint(data, offset)
+        result = []
+        for i in range(count):
+            item, offset = _decode(data, offset)
+            result.append(item)
+        return result, offset
+    elif tag == b'd':
+        count, offset = _unpack_varint(data, offset)
+        result = {}
+        for i in range(count):
+            key, offset = _decode(data, offset)
+            result[key], offset = _decode(data, offset)
+        return result, offset
+    else:
+        raise SaveFileError("Unknown value tag {!r} at offset {}".format(tag, offset - 1))
+
+
+def encode_record(record):
+    out = []
+    _encode(record, out)
+    return b''.join(out)
+
+
+def decode_record(data):
+    try:
+        record, offset = _decode(data, 0)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SaveFileError("Corrupt record: {}".format(e))
+    if offset != len(data):
+        raise SaveFileError("Trailing data after record")
+    return record
+
+
+def write_atomic(fpath, data):
+    # Write to a temporary file next to the target and rename it into place,
+    # so an interrupted save never leaves a truncated file behind
+    fpath = os.path.abspath(fpath)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(fpath), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, fpath)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+def pack_records(encoded_records):
+    parts = [_HEADER.pack(MAGIC, VERSION, len(encoded_records))]
+    for data in encoded_records:
+        parts.append(_pack_varint(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def unpack_records(data):
+    try:
+        magic, version, count = _HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise SaveFileError("Save file is too short")
+    if magic != MAGIC:
+        raise SaveFileError("Not a save file")
+    if version != VERSION:
+        raise SaveFileError("Unsupported save file version: {}".format(version))
+
+    records = []
+    offset = _HEADER.size
+    for i in range(count):
+        try:
+            length, offset = _unpack_varint(data, offset)
+        except SaveFileError:
+            raise SaveFileError("Save file is truncated")
+        if offset + length > len(data):
+            raise SaveFileError("Save file is truncated")
+        records.append(data[offset:offset+length])
+        offset += length
+
+    return records
+
+
+
+class SaveWriter:
+    """Write save files on a background thread
+
+    Requests for a path that is still waiting to be written replace the
+    queued data, so saves requested faster than they complete are coalesced
+    and only the latest one hits the disk.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='Save Writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fpath, data, on_error=None):
+        with self._cond:
+            if not self._closed:
+                self._pending[fpath] = (data, on_error)
+                self._cond.notify_all()
+                return
+
+        # The writer is shut down, fall back to writing in place
+        self._write(fpath, data, on_error)
+
+    def flush(self):
+        with self._cond:
+            while self._pending or self._busy:
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _write(self, fpath, data, on_error):
+        try:
+            write_atomic(fpath, data)
+        except OSError as e:
+            print("Warning: could not write save file {}: {}".format(fpath, e))
+            if on_error is not None:
+                on_error(e)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                fpath = next(iter(self._pending))
+                data, on_error = self._pending.pop(fpath)
+                self._busy = True
+
+            try:
+                self._write(fpath, data, on_error)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
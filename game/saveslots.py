@@ -0,0 +1,131 @@
+import os
+import time
+
+import savefile
+
+
+class SaveSlots:
+    """Save files in a directory plus a small index of per-slot metadata
+
+    The index lets the title screen list slots without opening every save.
+    Saves that show up on disk without an index entry (e.g., copied in by
+    hand) are read once to index them, and entries for deleted saves are
+    dropped.
+    """
+
+    index_name = 'index.dat'
+
+    def __init__(self, save_dir='saves'):
+        self.save_dir = save_dir
+        self.index_path = os.path.join(save_dir, self.index_name)
+        self._slots = None
+
+    def path(self, slot):
+        return os.path.join(self.save_dir, slot + '.sav')
+
+    @property
+    def slots(self):
+        if self._slots is None:
+            self._slots = self._load_index()
+            self._sync()
+        return self._slots
+
+    def list(self):
+        """Slot metadata, most recently saved first"""
+        return sorted(self.slots.values(), key=lambda i: i['timestamp'], reverse=True)
+
+    def new_slot(self):
+        slot = time.strftime('%Y%m%d-%H%M%S')
+        name = slot
+        suffix = 1
+        while name in self.slots:
+            suffix += 1
+            name = '{}-{}'.format(slot, suffix)
+        return name
+
+    def save(self, slot, save_data, force=False, writer=None):
+        # Read the index before a queued write could make it look stale
+        slots = self.slots
+
+        os.makedirs(self.save_dir, exist_ok=True)
+        size = save_data.write(self.path(slot), force=force, writer=writer)
+        if not size:
+            return False
+
+        slots[slot] = {
+            'slot': slot,
+            'mechs': [mech.name for mech in save_data.mechs],
+            'timestamp': time.time(),
+            'size': size,
+        }
+        self._write_index(writer)
+        return True
+
+    def remove(self, slot):
+        """Forget a slot, the save file itself is left alone"""
+        if self.slots.pop(slot, None) is not None:
+            self._write_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                records = savefile.unpack_records(f.read())
+            return {i['slot']: i for i in map(savefile.decode_record, records)}
+        except FileNotFoundError:
+            return {}
+        except (OSError, savefile.SaveFileError) as e:
+            print("Warning: could not read save index {}, rebuilding it: {}".format(self.index_path, e))
+            return {}
+
+    def _read_metadata(self, slot):
+        fpath = self.path(slot)
+        with open(fpath, 'rb') as f:
+            records = savefile.unpack_records(f.read())
+        stat = os.stat(fpath)
+
+        return {
+            'slot': slot,
+            'mechs': [savefile.decode_record(i).get('name', '') for i in records],
+            'timestamp': stat.st_mtime,
+            'size': stat.st_size,
+        }
+
+    def _sync(self):
+        try:
+            on_disk = {
+                entry.name[:-len('.sav')]
+                for entry in os.scandir(self.save_dir)
+                if entry.name.endswith('.sav') and entry.is_file()
+            }
+        except FileNotFoundError:
+            on_disk = set()
+
+        changed = False
+        for slot in list(self._slots):
+            if slot not in on_disk:
+                del self._slots[slot]
+                changed = True
+
+        for slot in on_disk - self._slots.keys():
+            try:
+                self._slots[slot] = self._read_metadata(slot)
+            except (OSError, savefile.SaveFileError) as e:
+                print("Warning: skipping unreadable save {}: {}".format(self.path(slot), e))
+                continue
+            changed = True
+
+        if changed:
+            self._write_index()
+
+    def _write_index(self, writer=None):
+        data = savefile.pack_records([
+            savefile.encode_record(i) for i in self._slots.values()
+        ])
+        if writer is not None:
+            writer.submit(self.index_path, data)
+            return
+
+        try:
+            savefile.write_atomic(self.index_path, data)
+        except OSError as e:
+            print("Warning: could not write save index {}: {}".format(self.index_path, e))
@@ -15,6 +15,14 @@ try:
 except ImportError:
     __with_libyaml__ = False
 
+# Safe loader backed by libyaml when the extension is available
+if __with_libyaml__:
+    FastLoader = CSafeLoader
+    __loader_backend__ = 'libyaml'
+else:
+    FastLoader = SafeLoader
+    __loader_backend__ = 'python'
+
 import io
 
 def scan(stream, Loader=Loader):
@@ -85,6 +93,20 @@ def load_all(stream, Loader=Loader):
     finally:
         loader.dispose()
 
+def iter_load(stream, Loader=StreamLoader):
+    """
+    Parse the first YAML document in a stream
+    and produce its top-level entries one at a time:
+    (key, value) pairs for a mapping, items for a sequence.
+    An empty or null document produces nothing.
+    Aliases to an earlier entry produce a copy rather than the same object.
+    """
+    loader = Loader(stream)
+    try:
+        yield from loader.get_entries()
+    finally:
+        loader.dispose()
+
 def safe_load(stream):
     """
     Parse the first YAML document in a stream
@@ -101,6 +123,14 @@ def safe_load_all(stream):
     """
     return load_all(stream, SafeLoader)
 
+def fast_load(stream):
+    """
+    Parse the first YAML document in a stream
+    and produce the corresponding Python object.
+    Resolve only basic YAML tags, using libyaml if available.
+    """
+    return load(stream, FastLoader)
+
 def emit(events, stream=None, Dumper=Dumper,
         canonical=None, indent=None, width=None,
         allow_unicode=None, line_break=None):
@@ -215,6 +245,19 @@ def safe_dump(data, stream=None, **kwds):
     """
     return dump_all([data], stream, Dumper=SafeDumper, **kwds)
 
+def fast_dump(data, stream=None, **kwds):
+    """
+    Serialize acyclic plain data into a YAML stream.
+    Produce the same output as safe_dump, except that repeated
+    objects are written out again instead of as aliases.
+    The document is built in memory and written with a single call.
+    If stream is None, return the produced string instead.
+    """
+    output = dump_all([data], None, Dumper=FastDumper, **kwds)
+    if stream is None:
+        return output
+    stream.write(output)
+
 def add_implicit_resolver(tag, regexp, first=None,
         Loader=Loader, Dumper=Dumper):
     """
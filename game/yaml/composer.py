@@ -60,6 +60,57 @@ class Composer:
         self.anchors = {}
         return node
 
+    def compose_entries(self):
+        # Compose the top-level entries of a single document one at a time.
+        # Yields (key, value) node pairs for a mapping and (None, item) for a
+        # sequence, so only the entry being consumed is kept in memory.
+        # Anchors stay available to later entries.
+
+        # Drop the STREAM-START and DOCUMENT-START events.
+        self.get_event()
+        if self.check_event(StreamEndEvent):
+            self.get_event()
+            return
+        self.get_event()
+
+        if self.check_event(ScalarEvent):
+            # An empty or null document has no entries, like an empty stream.
+            node = self.compose_node(None, None)
+            is_empty = node.value == '' and node.style is None
+            if not is_empty and node.tag != 'tag:yaml.org,2002:null':
+                raise ComposerError(None, None,
+                        "expected a mapping or a sequence", node.start_mark)
+        elif self.check_event(AliasEvent):
+            event = self.peek_event()
+            raise ComposerError(None, None,
+                    "expected a mapping or a sequence", event.start_mark)
+        else:
+            is_mapping = self.check_event(MappingStartEvent)
+            self.get_event()
+
+            index = 0
+            while not self.check_event(MappingEndEvent, SequenceEndEvent):
+                if is_mapping:
+                    item_key = self.compose_node(None, None)
+                    yield item_key, self.compose_node(None, item_key)
+                else:
+                    yield None, self.compose_node(None, index)
+                    index += 1
+
+            # Drop the collection end event.
+            self.get_event()
+
+        # Drop the DOCUMENT-END event.
+        self.get_event()
+        self.anchors = {}
+
+        # Ensure that the stream contains no more documents.
+        if not self.check_event(StreamEndEvent):
+            event = self.get_event()
+            raise ComposerError("expected a single document in the stream",
+                    None, "but found another document", event.start_mark)
+        self.get_event()
+
     def compose_node(self, parent, index):
         if self.check_event(AliasEvent):
             event = self.get_event()
@@ -37,6 +37,15 @@ class BaseConstructor:
             return self.construct_document(node)
         return None
 
+    def get_entries(self):
+        # Construct the top-level entries of a single document one at a time.
+        for key_node, value_node in self.compose_entries():
+            value = self.construct_document(value_node)
+            if key_node is None:
+                yield value
+            else:
+                yield self.construct_document(key_node), value
+
     def construct_document(self, node):
         data = self.construct_object(node)
         while self.state_generators:
@@ -1,10 +1,12 @@
 
-__all__ = ['BaseDumper', 'SafeDumper', 'Dumper']
+__all__ = ['BaseDumper', 'SafeDumper', 'FastDumper', 'Dumper']
 
 from .emitter import *
 from .serializer import *
 from .representer import *
 from .resolver import *
+from .events import *
+from .nodes import *
 
 class BaseDumper(Emitter, Serializer, BaseRepresenter, BaseResolver):
 
@@ -42,6 +44,67 @@ class SafeDumper(Emitter, Serializer, SafeRepresenter, Resolver):
                 default_flow_style=default_flow_style)
         Resolver.__init__(self)
 
+class FastDumper(SafeDumper):
+    """
+    SafeDumper for acyclic plain data.
+    Objects are not tracked, so repeated objects are written out again
+    instead of as anchors and aliases, and recursive data is not supported.
+    Scalars are resolved once and their analysis is reused.
+    """
+
+    def __init__(self, stream, **kwds):
+        SafeDumper.__init__(self, stream, **kwds)
+        self.analysis_cache = {}
+
+    def represent_data(self, data):
+        representer = self.yaml_representers.get(type(data))
+        if representer is None:
+            return SafeDumper.represent_data(self, data)
+        self.alias_key = None
+        return representer(self, data)
+
+    def anchor_node(self, node):
+        pass
+
+    def serialize_node(self, node, parent, index):
+        self.descend_resolver(parent, index)
+        if isinstance(node, ScalarNode):
+            detected_tag = self.resolve(ScalarNode, node.value, (True, False))
+            if self.yaml_path_resolvers:
+                default_tag = self.resolve(ScalarNode, node.value, (False, True))
+            else:
+                default_tag = self.DEFAULT_SCALAR_TAG
+            implicit = (node.tag == detected_tag), (node.tag == default_tag)
+            self.emit(ScalarEvent(None, node.tag, implicit, node.value,
+                style=node.style))
+        elif isinstance(node, SequenceNode):
+            implicit = (node.tag
+                        == self.resolve(SequenceNode, node.value, True))
+            self.emit(SequenceStartEvent(None, node.tag, implicit,
+                flow_style=node.flow_style))
+            index = 0
+            for item in node.value:
+                self.serialize_node(item, node, index)
+                index += 1
+            self.emit(SequenceEndEvent())
+        elif isinstance(node, MappingNode):
+            implicit = (node.tag
+                        == self.resolve(MappingNode, node.value, True))
+            self.emit(MappingStartEvent(None, node.tag, implicit,
+                flow_style=node.flow_style))
+            for key, value in node.value:
+                self.serialize_node(key, node, None)
+                self.serialize_node(value, node, key)
+            self.emit(MappingEndEvent())
+        self.ascend_resolver()
+
+    def analyze_scalar(self, scalar):
+        analysis = self.analysis_cache.get(scalar)
+        if analysis is None:
+            analysis = SafeDumper.analyze_scalar(self, scalar)
+            self.analysis_cache[scalar] = analysis
+        return analysis
+
 class Dumper(Emitter, Serializer, Representer, Resolver):
 
     def __init__(self, stream,
@@ -1,5 +1,5 @@
 
-__all__ = ['BaseLoader', 'SafeLoader', 'Loader']
+__all__ = ['BaseLoader', 'SafeLoader', 'StreamLoader', 'Loader']
 
 from .reader import *
 from .scanner import *
@@ -28,6 +28,11 @@ class SafeLoader(Reader, Scanner, Parser, Composer, SafeConstructor, Resolver):
         SafeConstructor.__init__(self)
         Resolver.__init__(self)
 
+class StreamLoader(SafeLoader):
+
+    # Decode the input in chunks rather than reading it all up front.
+    bulk_read = False
+
 class Loader(Reader, Scanner, Parser, Composer, Constructor, Resolver):
 
     def __init__(self, stream):
@@ -56,6 +56,11 @@ class Reader(object):
 
     # Yeah, it's ugly and slow.
 
+    # Read file-like objects in one go and decode them in a single pass, so
+    # peek/prefix/forward never have to refill and re-slice the buffer.
+    # Subclasses that need bounded memory on huge streams can turn it off.
+    bulk_read = True
+
     def __init__(self, stream):
         self.name = None
         self.stream = None
@@ -77,6 +82,15 @@ class Reader(object):
             self.name = "<byte string>"
             self.raw_buffer = stream
             self.determine_encoding()
+        elif self.bulk_read:
+            self.name = getattr(stream, 'name', "<file>")
+            data = stream.read()
+            if isinstance(data, str):
+                self.check_printable(data)
+                self.buffer = data+'\0'
+            else:
+                self.raw_buffer = data
+                self.determine_encoding()
         else:
             self.stream = stream
             self.name = getattr(stream, 'name', "<file>")
@@ -96,9 +110,21 @@ class Reader(object):
             self.update(length)
         return self.buffer[self.pointer:self.pointer+length]
 
+    # Characters that affect line/column tracking.
+    LINE_SPECIAL = re.compile('[\n\r\x85\u2028\u2029\uFEFF]')
+
     def forward(self, length=1):
         if self.pointer+length+1 >= len(self.buffer):
             self.update(length+1)
+        if length > 1:
+            # Skip the run of ordinary characters in one step, only the
+            # tail starting at a line break or BOM needs per-character care.
+            match = self.LINE_SPECIAL.search(self.buffer, self.pointer, self.pointer+length)
+            plain = (match.start()-self.pointer) if match else length
+            self.pointer += plain
+            self.index += plain
+            self.column += plain
+            length -= plain
         while length:
             ch = self.buffer[self.pointer]
             self.pointer += 1
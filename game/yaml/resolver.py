@@ -18,6 +18,11 @@ class BaseResolver:
     yaml_implicit_resolvers = {}
     yaml_path_resolvers = {}
 
+    # Per resolver class, the implicit resolvers for each leading character
+    # (plus those registered for any character) fused into a single regex.
+    # Built on first use and dropped whenever a resolver is added.
+    _implicit_dispatch = {}
+
     def __init__(self):
         self.resolver_exact_paths = []
         self.resolver_prefix_paths = []
@@ -30,6 +35,40 @@ class BaseResolver:
             first = [None]
         for ch in first:
             cls.yaml_implicit_resolvers.setdefault(ch, []).append((tag, regexp))
+        BaseResolver._implicit_dispatch.clear()
+
+    @classmethod
+    def compile_implicit_resolvers(cls):
+        fallback = cls.yaml_implicit_resolvers.get(None, [])
+        table = {}
+        for ch, resolvers in cls.yaml_implicit_resolvers.items():
+            if ch is not None:
+                table[ch] = cls._fuse_resolvers(resolvers + fallback)
+        table[None] = cls._fuse_resolvers(fallback)
+        BaseResolver._implicit_dispatch[cls] = table
+        return table
+
+    @staticmethod
+    def _fuse_resolvers(resolvers):
+        # Returns (regexp, resolvers), the match's group index picks the tag.
+        # Patterns with their own groups or flags that cannot be scoped are
+        # left alone and tried one after the other, as before.
+        resolvers = tuple(resolvers)
+        if not resolvers:
+            return None, resolvers
+        scoped_flags = (('i', re.I), ('m', re.M), ('s', re.S), ('x', re.X))
+        allowed = re.I|re.M|re.S|re.X|re.U
+        for tag, regexp in resolvers:
+            if (not isinstance(regexp.pattern, str) or regexp.groups
+                    or regexp.flags & ~allowed):
+                return None, resolvers
+        parts = []
+        for tag, regexp in resolvers:
+            flags = ''.join(f for f, flag in scoped_flags if regexp.flags & flag)
+            # A newline ends any trailing comment in a verbose pattern.
+            parts.append('((?%s:%s%s))' % (flags, regexp.pattern,
+                '\n' if regexp.flags & re.X else ''))
+        return re.compile('|'.join(parts)), resolvers
 
     @classmethod
     def add_path_resolver(cls, tag, path, kind=None):
@@ -139,14 +178,18 @@ class BaseResolver:
 
     def resolve(self, kind, value, implicit):
         if kind is ScalarNode and implicit[0]:
-            if value == '':
-                resolvers = self.yaml_implicit_resolvers.get('', [])
+            table = self._implicit_dispatch.get(self.__class__)
+            if table is None:
+                table = self.compile_implicit_resolvers()
+            fused, resolvers = table.get(value[:1], table[None])
+            if fused is not None:
+                match = fused.match(value)
+                if match:
+                    return resolvers[match.lastindex-1][0]
             else:
-                resolvers = self.yaml_implicit_resolvers.get(value[0], [])
-            resolvers += self.yaml_implicit_resolvers.get(None, [])
-            for tag, regexp in resolvers:
-                if regexp.match(value):
-                    return tag
+                for tag, regexp in resolvers:
+                    if regexp.match(value):
+                        return tag
             implicit = implicit[1]
         if self.yaml_path_resolvers:
             exact_paths = self.resolver_exact_paths[-1]
@@ -29,6 +29,8 @@ __all__ = ['Scanner', 'ScannerError']
 from .error import MarkedYAMLError
 from .tokens import *
 
+import re
+
 class ScannerError(MarkedYAMLError):
     pass
 
@@ -45,6 +47,16 @@ class SimpleKey:
 
 class Scanner:
 
+    # Runs of ordinary characters. The scanners below consume a whole run
+    # with one match and only look at single characters where a run stops,
+    # i.e., at the characters that end it or at the end of the buffer.
+    RUN_SPACES = re.compile(' *')
+    RUN_LINE = re.compile('[^\0\r\n\x85\u2028\u2029]*')
+    RUN_QUOTED = re.compile('[^\'"\\\\\0 \t\r\n\x85\u2028\u2029]*')
+    RUN_PLAIN_BLOCK = re.compile(
+            '(?:[^\0 \t\r\n\x85\u2028\u2029:]|:(?=[^\0 \t\r\n\x85\u2028\u2029]))*')
+    RUN_PLAIN_FLOW = re.compile('[^\0 \t\r\n\x85\u2028\u2029,:?\\[\\]{}]*')
+
     def __init__(self):
         """Initialize the scanner."""
         # It is assumed that Scanner and Reader will have a common descendant.
@@ -750,6 +762,12 @@ class Scanner:
 
     # Scanners.
 
+    def match_run(self, pattern, index=0):
+        # Length of the run matching `pattern` at `index` characters past
+        # the current position, within the buffered input only.
+        start = self.pointer+index
+        return pattern.match(self.buffer, start).end()-start
+
     def scan_to_next_token(self):
         # We ignore spaces, line breaks and comments.
         # If we find a line break in the block context, we set the flag
@@ -775,10 +793,10 @@ class Scanner:
         found = False
         while not found:
             while self.peek() == ' ':
-                self.forward()
+                self.forward(self.match_run(self.RUN_SPACES))
             if self.peek() == '#':
                 while self.peek() not in '\0\r\n\x85\u2028\u2029':
-                    self.forward()
+                    self.forward(self.match_run(self.RUN_LINE))
             if self.scan_line_break():
                 if not self.flow_level:
                     self.allow_simple_key = True
@@ -1008,7 +1026,7 @@ class Scanner:
             leading_non_space = self.peek() not in ' \t'
             length = 0
             while self.peek(length) not in '\0\r\n\x85\u2028\u2029':
-                length += 1
+                length += self.match_run(self.RUN_LINE, length)
             chunks.append(self.prefix(length))
             self.forward(length)
             line_break = self.scan_line_break()
@@ -1188,7 +1206,7 @@ class Scanner:
         while True:
             length = 0
             while self.peek(length) not in '\'\"\\\0 \t\r\n\x85\u2028\u2029':
-                length += 1
+                length += self.match_run(self.RUN_QUOTED, length)
             if length:
                 chunks.append(self.prefix(length))
                 self.forward(length)
@@ -1283,16 +1301,23 @@ class Scanner:
         #    indent = 1
         spaces = []
         while True:
-            length = 0
             if self.peek() == '#':
                 break
+            if self.flow_level:
+                run = self.RUN_PLAIN_FLOW
+            else:
+                run = self.RUN_PLAIN_BLOCK
+            length = 0
             while True:
+                length += self.match_run(run, length)
                 ch = self.peek(length)
                 if ch in '\0 \t\r\n\x85\u2028\u2029'    \
                         or (not self.flow_level and ch == ':' and
                                 self.peek(length+1) in '\0 \t\r\n\x85\u2028\u2029') \
                         or (self.flow_level and ch in ',:?[]{}'):
                     break
+                # The run stopped at the end of the buffer, e.g., on a ':'
+                # whose next character has not been read yet
                 length += 1
             # It's not clear what we should do with ':' in the flow context.
             if (self.flow_level and ch == ':'
@@ -1320,8 +1345,8 @@ class Scanner:
         # We just forbid them completely. Do not use tabs in YAML!
         chunks = []
         length = 0
-        while self.peek(length) in ' ':
-            length += 1
+        while self.peek(length) == ' ':
+            length += self.match_run(self.RUN_SPACES, length)
         whitespaces = self.prefix(length)
         self.forward(length)
         ch = self.peek()